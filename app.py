@@ -4,22 +4,41 @@ import json
 import uuid
 import socket
 from datetime import datetime
+from functools import wraps
 from pathlib import Path
-from flask import Flask, render_template, request, session, redirect, url_for, flash
+from flask import Flask, render_template, request, session, redirect, url_for, flash, jsonify
 from flask_socketio import SocketIO, emit, join_room, leave_room
 
 from database import db  # Импортируем нашу базу данных
+from flow_control import RateLimiter, OutboundGuard
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'super-secret-chat-key-2024'
 app.config['DEBUG'] = True
 
+# Лимиты событий: {событие: {область: (токенов в секунду, ёмкость корзины)}}
+app.config['RATE_LIMITS'] = {
+    'private_message': {'connection': (5, 10), 'user': (10, 20)},
+    'group_message': {'connection': (5, 10), 'user': (10, 20)},
+    'typing_start': {'connection': (2, 5), 'user': (4, 10)},
+    'typing_stop': {'connection': (2, 5), 'user': (4, 10)},
+    'add_group_members': {'connection': (1, 5), 'user': (1, 5)},
+    'remove_group_members': {'connection': (1, 5), 'user': (1, 5)},
+}
+# Максимум неотправленных пакетов клиенту и что делать при переполнении
+app.config['OUTBOUND_QUEUE_LIMIT'] = 256
+app.config['OUTBOUND_OVERFLOW_POLICY'] = 'drop'  # 'drop' или 'disconnect'
+
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 # Глобальные переменные для онлайн статуса
 active_users = {}  # {socket_id: username}
 user_sessions = {}  # {username: socket_id}
 
+rate_limiter = RateLimiter(app.config['RATE_LIMITS'])
+outbound_guard = OutboundGuard(app.config['OUTBOUND_QUEUE_LIMIT'],
+                               app.config['OUTBOUND_OVERFLOW_POLICY'])
+
 # ==================== ROUTES ====================
 
 @app.route('/')
@@ -135,6 +154,35 @@ def create_group():
     
     return render_template('create_group.html', other_users=other_users)
 
+@app.route('/api/groups/<int:group_id>/members', methods=['POST', 'DELETE'])
+def group_members_api(group_id):
+    if 'username' not in session:
+        return jsonify({'error': 'Требуется вход'}), 401
+    
+    remove = request.method == 'DELETE'
+    event = 'remove_group_members' if remove else 'add_group_members'
+    retry_after = rate_limiter.check(event, None, session['username'])
+    if retry_after:
+        return jsonify({'error': 'Слишком много запросов', 'retry_after': round(retry_after, 2)}), 429
+    
+    data = request.get_json(silent=True) or {}
+    result, error = change_group_members(session['username'], group_id, data.get('members'), remove)
+    if error:
+        message, status = error
+        return jsonify({'error': message}), status
+    
+    return jsonify(result)
+
+@app.route('/api/flow_stats')
+def flow_stats():
+    if 'username' not in session:
+        return jsonify({'error': 'Требуется вход'}), 401
+    
+    return jsonify({
+        'rate_limited': rate_limiter.stats(),
+        'outbound': outbound_guard.stats()
+    })
+
 @app.route('/profile')
 def profile():
     if 'username' not in session:
@@ -175,6 +223,120 @@ def logout():
     flash('Вы вышли из системы', 'info')
     return redirect('/login')
 
+# ==================== FLOW CONTROL ====================
+
+def rate_limited(event):
+    """Отбрасывает событие, если соединение или пользователь превысили лимит"""
+    if event not in app.config['RATE_LIMITS']:
+        raise KeyError(f'Нет лимитов для события {event}')
+    
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            retry_after = rate_limiter.check(event, request.sid, session.get('username'))
+            if retry_after:
+                # Одно уведомление на окно ожидания и только если клиент успевает читать
+                if rate_limiter.should_notify(request.sid, event, retry_after):
+                    guarded_emit('rate_limited', {'event': event, 'retry_after': round(retry_after, 2)},
+                                 room=request.sid)
+                return None
+            return handler(*args, **kwargs)
+        
+        return wrapper
+    
+    return decorator
+
+def guarded_emit(event, data, room=None, include_self=True):
+    """Рассылка в комнату (или всем) без клиентов, не успевающих читать"""
+    skip_sid = outbound_guard.slow_consumers(socketio.server, '/', room)
+    if not include_self:
+        skip_sid.append(request.sid)
+    
+    if room is None:
+        socketio.emit(event, data, skip_sid=skip_sid or None)
+    else:
+        socketio.emit(event, data, room=room, skip_sid=skip_sid or None)
+
+# ==================== GROUP MEMBERSHIP ====================
+
+def change_group_members(username, group_id, members, remove):
+    """Добавляет или удаляет участников группы от имени username.
+    
+    Возвращает (результат, None) или (None, (текст ошибки, HTTP-код)).
+    """
+    if not isinstance(members, list) or not all(isinstance(m, str) for m in members):
+        return None, ('Ожидается список имён пользователей members', 400)
+    
+    group = db.get_group(group_id)
+    if not group:
+        return None, ('Группа не найдена', 404)
+    if group['admin'] != username:
+        return None, ('Только администратор может менять состав группы', 403)
+    
+    if remove:
+        added, removed = [], db.remove_group_members(group_id, members)
+    else:
+        added, removed = db.add_group_members(group_id, members), []
+    
+    if added is None or removed is None:
+        return None, ('Ошибка при изменении состава группы', 500)
+    
+    member_count = sync_group_membership(group, added, removed)
+    print(f"👥 {username} изменил состав группы {group['name']}: +{len(added)} -{len(removed)}")
+    return {
+        'group_id': group['group_id'],
+        'added': added,
+        'removed': removed,
+        'member_count': member_count
+    }, None
+
+def room_sids(room):
+    """sid всех сокетов в комнате"""
+    manager = socketio.server.manager
+    # python-socketio удаляет пространство имен, когда отключается последний клиент
+    if '/' not in manager.rooms:
+        return []
+    return [sid for sid, eio_sid in manager.get_participants('/', room)]
+
+def sync_group_membership(group, added, removed):
+    """Обновляет комнату группы после изменения состава участников"""
+    if not added and not removed:
+        return group['member_count']
+    
+    group_id = group['group_id']
+    room = str(group_id)
+    # Пересчитываем после записи: состав могли менять параллельно
+    current = db.get_group(group_id)
+    member_count = current['member_count'] if current else 0
+    
+    # У пользователя может быть несколько вкладок - убираем из комнаты все его сокеты
+    removed_set = set(removed)
+    for sid in room_sids(room):
+        if active_users.get(sid) in removed_set:
+            leave_room(room, sid=sid, namespace='/')
+    
+    # Уведомляем все онлайн-сокеты затронутых пользователей
+    added_set = set(added)
+    for sid, username in list(active_users.items()):
+        if username in removed_set:
+            socketio.emit('group_removed', {'group_id': group_id}, room=sid)
+        elif username in added_set:
+            socketio.emit('group_added', {
+                'group_id': group_id,
+                'name': group['name'],
+                'admin': group['admin'],
+                'member_count': member_count
+            }, room=sid)
+    
+    guarded_emit('group_members_update', {
+        'group_id': group_id,
+        'added': added,
+        'removed': removed,
+        'member_count': member_count
+    }, room=room)
+    
+    return member_count
+
 # ==================== SOCKET IO HANDLERS ====================
 
 @socketio.on('connect')
@@ -188,8 +350,8 @@ def handle_connect():
         db.update_last_seen(username)
         
         # Уведомляем всех о новом пользователе онлайн
-        emit('user_online', {'username': username}, broadcast=True)
-        emit('online_users_update', {'users': list(active_users.values())}, broadcast=True)
+        guarded_emit('user_online', {'username': username})
+        guarded_emit('online_users_update', {'users': list(active_users.values())})
         print(f"✅ {username} подключился. Онлайн: {len(active_users)}")
 
 @socketio.on('disconnect')
@@ -197,10 +359,11 @@ def handle_disconnect():
     username = active_users.pop(request.sid, None)
     if username and username in user_sessions:
         del user_sessions[username]
+    rate_limiter.forget_connection(request.sid)
     
     if username:
-        emit('user_offline', {'username': username}, broadcast=True)
-        emit('online_users_update', {'users': list(active_users.values())}, broadcast=True)
+        guarded_emit('user_offline', {'username': username}, include_self=False)
+        guarded_emit('online_users_update', {'users': list(active_users.values())}, include_self=False)
         print(f"❌ {username} отключился. Онлайн: {len(active_users)}")
 
 @socketio.on('start_private_chat')
@@ -247,7 +410,26 @@ def handle_join_group(data):
             })
             print(f"👥 {username} присоединился к группе {group_info['name']}")
 
+@socketio.on('add_group_members')
+@rate_limited('add_group_members')
+def handle_add_group_members(data):
+    update_group_members(data, remove=False)
+
+@socketio.on('remove_group_members')
+@rate_limited('remove_group_members')
+def handle_remove_group_members(data):
+    update_group_members(data, remove=True)
+
+def update_group_members(data, remove):
+    if not isinstance(data, dict):
+        data = {}
+    group_id = data.get('group_id')
+    result, error = change_group_members(session['username'], group_id, data.get('members'), remove)
+    if error:
+        emit('group_members_error', {'group_id': group_id, 'error': error[0]})
+
 @socketio.on('private_message')
+@rate_limited('private_message')
 def handle_private_message(data):
     username = session['username']
     chat_id = data['chat_id']
@@ -264,7 +446,7 @@ def handle_private_message(data):
         }
         
         # Отправляем сообщение в комнату приватного чата
-        emit('new_private_message', {
+        guarded_emit('new_private_message', {
             'chat_id': chat_id,
             'message': message_data
         }, room=str(chat_id))
@@ -272,11 +454,16 @@ def handle_private_message(data):
         print(f"📨 {username} -> Чат {chat_id}: {message_text}")
 
 @socketio.on('group_message')
+@rate_limited('group_message')
 def handle_group_message(data):
     username = session['username']
     group_id = data['group_id']
     message_text = data['text'].strip()
     
+    # Писать в группу могут только ее участники
+    if not db.is_group_member(group_id, username):
+        return
+    
     if message_text:
         # Сохраняем сообщение в базу
         db.add_group_message(group_id, username, message_text)
@@ -288,7 +475,7 @@ def handle_group_message(data):
         }
         
         # Отправляем сообщение в комнату группы
-        emit('new_group_message', {
+        guarded_emit('new_group_message', {
             'group_id': group_id,
             'message': message_data
         }, room=str(group_id))
@@ -296,21 +483,23 @@ def handle_group_message(data):
         print(f"👥 {username} -> Группа {group_id}: {message_text}")
 
 @socketio.on('typing_start')
+@rate_limited('typing_start')
 def handle_typing_start(data):
     username = session['username']
     chat_type = data['chat_type']
     chat_id = data['chat_id']
     
-    emit('user_typing', {
+    guarded_emit('user_typing', {
         'username': username,
         'chat_type': chat_type,
         'chat_id': chat_id
     }, room=str(chat_id), include_self=False)
 
 @socketio.on('typing_stop')
+@rate_limited('typing_stop')
 def handle_typing_stop(data):
     chat_id = data['chat_id']
-    emit('user_stop_typing', {'chat_id': chat_id}, room=str(chat_id))
+    guarded_emit('user_stop_typing', {'chat_id': chat_id}, room=str(chat_id))
 
 # ==================== MAIN ====================
 
@@ -0,0 +1 @@
+# Корень проекта в sys.path, чтобы тесты импортировали database и flow_control
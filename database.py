@@ -4,6 +4,9 @@ import json
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# Максимум параметров в одном запросе IN (...) (лимит SQLite - 999)
+SQL_BATCH_SIZE = 500
+
 class Database:
     def __init__(self, db_path='chat.db'):
         self.db_path = db_path
@@ -70,6 +73,12 @@ class Database:
             )
         ''')
         
+        # Индекс для выборки групп пользователя
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_group_members_username
+            ON group_members (username)
+        ''')
+        
         # Таблица сообщений групп
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS group_messages (
@@ -249,6 +258,31 @@ class Database:
     
     # ==================== GROUP METHODS ====================
     
+    def _select_existing(self, cursor, query, params, usernames):
+        """Возвращает те имена из usernames, что нашлись по запросу query.
+        
+        Имена подставляются в IN (...) пачками по SQL_BATCH_SIZE.
+        """
+        found = set()
+        for i in range(0, len(usernames), SQL_BATCH_SIZE):
+            batch = usernames[i:i + SQL_BATCH_SIZE]
+            cursor.execute(query % ','.join('?' * len(batch)), list(params) + batch)
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+    
+    def _known_users(self, cursor, usernames):
+        """Зарегистрированные пользователи из списка"""
+        return self._select_existing(cursor, '''
+            SELECT username FROM users WHERE username IN (%s)
+        ''', (), usernames)
+    
+    def _current_members(self, cursor, group_id, usernames):
+        """Пользователи из списка, уже состоящие в группе"""
+        return self._select_existing(cursor, '''
+            SELECT username FROM group_members
+            WHERE group_id = ? AND username IN (%s)
+        ''', (group_id,), usernames)
+    
     def create_group(self, name, admin, members):
         """Создание группы"""
         conn = sqlite3.connect(self.db_path)
@@ -263,13 +297,15 @@ class Database:
             
             group_id = cursor.lastrowid
             
-            # Добавляем участников
-            all_members = [admin] + members
-            for member in all_members:
-                cursor.execute('''
-                    INSERT INTO group_members (group_id, username, joined_date)
-                    VALUES (?, ?, ?)
-                ''', (group_id, member, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            # Добавляем зарегистрированных участников одним пакетом (без дубликатов)
+            members = [m for m in dict.fromkeys(members) if m != admin]
+            known = self._known_users(cursor, members)
+            all_members = [admin] + [m for m in members if m in known]
+            joined_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            cursor.executemany('''
+                INSERT INTO group_members (group_id, username, joined_date)
+                VALUES (?, ?, ?)
+            ''', [(group_id, member, joined_date) for member in all_members])
             
             conn.commit()
             return group_id
@@ -279,6 +315,108 @@ class Database:
         finally:
             conn.close()
     
+    def get_group(self, group_id):
+        """Получение группы"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT g.id, g.name, g.admin, g.created_date,
+                   (SELECT COUNT(*) FROM group_members WHERE group_id = g.id) as member_count
+            FROM groups g
+            WHERE g.id = ?
+        ''', (group_id,))
+        
+        group = cursor.fetchone()
+        conn.close()
+        
+        if group:
+            return {
+                'group_id': group[0],
+                'name': group[1],
+                'admin': group[2],
+                'created_date': group[3],
+                'member_count': group[4]
+            }
+        return None
+    
+    def is_group_member(self, group_id, username):
+        """Проверка, состоит ли пользователь в группе"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT 1 FROM group_members WHERE group_id = ? AND username = ?
+        ''', (group_id, username))
+        
+        member = cursor.fetchone()
+        conn.close()
+        
+        return member is not None
+    
+    def add_group_members(self, group_id, usernames):
+        """Массовое добавление участников в группу.
+        
+        Возвращает список действительно добавленных пользователей
+        (существующих и ещё не состоящих в группе) или None при ошибке.
+        """
+        usernames = list(dict.fromkeys(usernames))
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT id FROM groups WHERE id = ?', (group_id,))
+            if not cursor.fetchone():
+                return None
+            
+            known = self._known_users(cursor, usernames)
+            current = self._current_members(cursor, group_id, usernames)
+            added = [u for u in usernames if u in known and u not in current]
+            
+            joined_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            cursor.executemany('''
+                INSERT INTO group_members (group_id, username, joined_date)
+                VALUES (?, ?, ?)
+            ''', [(group_id, username, joined_date) for username in added])
+            
+            conn.commit()
+            return added
+        except sqlite3.Error:
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+    
+    def remove_group_members(self, group_id, usernames):
+        """Массовое удаление участников из группы.
+        
+        Администратора удалить нельзя. Возвращает список удалённых
+        пользователей или None при ошибке.
+        """
+        usernames = list(dict.fromkeys(usernames))
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT admin FROM groups WHERE id = ?', (group_id,))
+            group = cursor.fetchone()
+            if not group:
+                return None
+            
+            current = self._current_members(cursor, group_id, usernames)
+            removed = [u for u in usernames if u in current and u != group[0]]
+            cursor.executemany('''
+                DELETE FROM group_members WHERE group_id = ? AND username = ?
+            ''', [(group_id, username) for username in removed])
+            
+            conn.commit()
+            return removed
+        except sqlite3.Error:
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+    
     def add_group_message(self, group_id, username, message_text):
         """Добавление сообщения в группу"""
         conn = sqlite3.connect(self.db_path)
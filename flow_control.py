@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+import time
+import threading
+from collections import Counter
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def refill(self, now):
+        """Начисляет токены за прошедшее время"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def retry_after(self):
+        """0, если токен есть, иначе сколько секунд ждать"""
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+    
+    def consume(self, now):
+        """Забирает один токен. Возвращает 0 или сколько секунд ждать"""
+        self.refill(now)
+        wait = self.retry_after()
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+class RateLimiter:
+    """Ограничение частоты событий на соединение и на пользователя.
+    
+    limits: {событие: {'connection': (rate, capacity), 'user': (rate, capacity)}}
+    События без настроек не ограничиваются.
+    """
+    
+    def __init__(self, limits):
+        self.limits = limits
+        self.buckets = {'connection': {}, 'user': {}}  # {scope: {key: {event: TokenBucket}}}
+        self.notice_until = {}  # {sid: {event: время, до которого не уведомляем}}
+        self.counters = Counter()  # {(scope, event): отклонено}
+        self.lock = threading.Lock()
+    
+    def check(self, event, sid, username):
+        """Возвращает 0, если событие разрешено, иначе время ожидания в секундах.
+        
+        sid или username можно передать как None, чтобы не проверять эту область.
+        Токены списываются, только если событие разрешено во всех областях.
+        """
+        event_limits = self.limits.get(event)
+        if not event_limits:
+            return 0
+        
+        now = time.monotonic()
+        with self.lock:
+            buckets = []
+            for scope, key in (('connection', sid), ('user', username)):
+                if scope not in event_limits or key is None:
+                    continue
+                key_buckets = self.buckets[scope].setdefault(key, {})
+                bucket = key_buckets.get(event)
+                if bucket is None:
+                    bucket = key_buckets[event] = TokenBucket(*event_limits[scope])
+                bucket.refill(now)
+                retry_after = bucket.retry_after()
+                if retry_after:
+                    self.counters[(scope, event)] += 1
+                    return retry_after
+                buckets.append(bucket)
+            
+            for bucket in buckets:
+                bucket.consume(now)
+        return 0
+    
+    def should_notify(self, sid, event, retry_after):
+        """Разрешает одно уведомление об отказе на окно ожидания (sid, event)"""
+        now = time.monotonic()
+        with self.lock:
+            sid_notices = self.notice_until.setdefault(sid, {})
+            if now < sid_notices.get(event, 0):
+                return False
+            sid_notices[event] = now + retry_after
+            return True
+    
+    def forget_connection(self, sid):
+        """Удаляет корзины отключившегося соединения"""
+        with self.lock:
+            self.buckets['connection'].pop(sid, None)
+            self.notice_until.pop(sid, None)
+    
+    def stats(self):
+        with self.lock:
+            return {f'{scope}:{event}': count for (scope, event), count in self.counters.items()}
+
+class OutboundGuard:
+    """Ограничение исходящей очереди клиента.
+    
+    Смотрит на очередь пакетов Engine.IO каждого получателя. Если в ней
+    больше limit пакетов, клиент не успевает читать: при политике 'drop'
+    новое сообщение ему не отправляется, при 'disconnect' он отключается.
+    """
+    
+    POLICIES = ('drop', 'disconnect')
+    
+    def __init__(self, limit, policy='drop'):
+        if policy not in self.POLICIES:
+            raise ValueError(f'Неизвестная политика: {policy}')
+        self.limit = limit
+        self.policy = policy
+        self.counters = Counter()  # {'dropped': ..., 'disconnected': ...}
+        self.disconnecting = set()
+        self.lock = threading.Lock()
+    
+    def backlog(self, server, eio_sid):
+        """Количество пакетов, ожидающих отправки клиенту"""
+        socket = server.eio.sockets.get(eio_sid)
+        return socket.queue.qsize() if socket else 0
+    
+    def slow_consumers(self, server, namespace, room):
+        """Возвращает sid получателей, которых нужно пропустить при отправке"""
+        # python-socketio удаляет пространство имен, когда отключается последний клиент
+        if namespace not in server.manager.rooms:
+            return []
+        
+        slow = {sid: eio_sid for sid, eio_sid in server.manager.get_participants(namespace, room)
+                if self.backlog(server, eio_sid) > self.limit}
+        if not slow:
+            return []
+        
+        with self.lock:
+            # Обработчик disconnect сам рассылает события - не считаем и не отключаем повторно
+            fresh = [sid for sid in slow if sid not in self.disconnecting]
+            self.counters['dropped'] += len(fresh)
+            if self.policy == 'disconnect':
+                to_disconnect = fresh
+                self.disconnecting.update(to_disconnect)
+                self.counters['disconnected'] += len(to_disconnect)
+            else:
+                to_disconnect = []
+        
+        for sid in to_disconnect:
+            try:
+                server.disconnect(sid, namespace=namespace)
+                # Закрываем и транспорт, иначе очередь пакетов Engine.IO останется в памяти
+                server.eio.disconnect(slow[sid])
+            finally:
+                with self.lock:
+                    self.disconnecting.discard(sid)
+        return list(slow)
+    
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
@@ -88,6 +88,51 @@ socket.on('new_group_message', function(data) {
     }
 });
 
+socket.on('group_members_update', function(data) {
+    console.log('👥 Group members update:', data);
+    const countElement = document.querySelector(`.join-group[data-group-id="${data.group_id}"] .d-flex > small`);
+    if (countElement) {
+        countElement.textContent = `${data.member_count} участ.`;
+    }
+    if (currentChatType === 'group' && data.group_id == currentChatId) {
+        if (data.added.length) {
+            addSystemMessage(`Добавлено участников: ${data.added.length}`);
+        }
+        if (data.removed.length) {
+            addSystemMessage(`Удалено участников: ${data.removed.length}`);
+        }
+    }
+});
+
+socket.on('group_added', function(data) {
+    console.log('👥 Added to group:', data.name);
+    addGroupToList(data);
+});
+
+socket.on('group_removed', function(data) {
+    console.log('🚫 Removed from group:', data.group_id);
+    const groupElement = document.querySelector(`.join-group[data-group-id="${data.group_id}"]`);
+    if (groupElement) {
+        groupElement.remove();
+    }
+    if (currentChatType === 'group' && data.group_id == currentChatId) {
+        clearCurrentChat();
+        addSystemMessage('Вас удалили из группы');
+    }
+});
+
+socket.on('group_members_error', function(data) {
+    console.log('❌ Group members error:', data);
+    addSystemMessage(data.error);
+});
+
+socket.on('rate_limited', function(data) {
+    console.log('⏳ Rate limited:', data.event, data.retry_after);
+    if (data.event === 'private_message' || data.event === 'group_message') {
+        addSystemMessage(`Слишком часто! Повторите через ${Math.ceil(data.retry_after)} с`);
+    }
+});
+
 socket.on('user_typing', function(data) {
     if (currentChatId && data.chat_id == currentChatId && data.username !== currentUsername) {
         showTypingIndicator(data.username);
@@ -434,6 +479,39 @@ function updatePrivateChatList(chatId, message) {
     }
 }
 
+function addGroupToList(group) {
+    const groupsList = document.getElementById('groups-list');
+    if (!groupsList || groupsList.querySelector(`.join-group[data-group-id="${group.group_id}"]`)) {
+        return;
+    }
+    
+    // Убираем заглушку "Вы не в группах"
+    groupsList.querySelectorAll('.list-group-item:not(.join-group)').forEach(item => item.remove());
+    
+    const groupElement = document.createElement('div');
+    groupElement.className = 'list-group-item user-item join-group chat-group';
+    groupElement.setAttribute('data-group-id', group.group_id);
+    groupElement.innerHTML = `
+        <div class="d-flex justify-content-between align-items-start">
+            <div>
+                <strong>${escapeHtml(group.name)}</strong>
+            </div>
+            <small class="text-muted">${group.member_count} участ.</small>
+        </div>
+        <div class="mt-1">
+            <small class="text-muted">
+                Админ: ${escapeHtml(group.admin)}
+            </small>
+        </div>
+    `;
+    groupElement.addEventListener('click', function(e) {
+        e.preventDefault();
+        joinGroup(this.getAttribute('data-group-id'));
+    });
+    
+    groupsList.appendChild(groupElement);
+}
+
 // Utility functions
 function escapeHtml(text) {
     if (!text) return '';
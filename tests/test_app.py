@@ -0,0 +1,113 @@
+import pytest
+
+# Сокеты живут на общем сервере модуля app - отключаем их после каждого теста
+open_sockets = []
+
+@pytest.fixture
+def chat(tmp_path, monkeypatch):
+    # db работает с относительным chat.db - каждому тесту своя папка
+    monkeypatch.chdir(tmp_path)
+    import app as chat_app
+    
+    chat_app.db.init_db()
+    monkeypatch.setattr(chat_app, 'active_users', {})
+    monkeypatch.setattr(chat_app, 'user_sessions', {})
+    monkeypatch.setattr(chat_app, 'rate_limiter',
+                        chat_app.RateLimiter(chat_app.app.config['RATE_LIMITS']))
+    monkeypatch.setattr(chat_app, 'outbound_guard', chat_app.OutboundGuard(
+        chat_app.app.config['OUTBOUND_QUEUE_LIMIT'], chat_app.app.config['OUTBOUND_OVERFLOW_POLICY']))
+    for username in ['alice', 'bob', 'carl']:
+        chat_app.db.add_user(username, 'secret1')
+    yield chat_app
+    
+    while open_sockets:
+        socket = open_sockets.pop()
+        if socket.is_connected():
+            socket.disconnect()
+
+def login(chat, username):
+    client = chat.app.test_client()
+    client.post('/login', data={'username': username, 'password': 'secret1'})
+    return client
+
+def connect(chat, client):
+    socket = chat.socketio.test_client(chat.app, flask_test_client=client)
+    open_sockets.append(socket)
+    socket.get_received()
+    return socket
+
+def names(socket):
+    return [packet['name'] for packet in socket.get_received()]
+
+def test_removed_user_loses_group_access_in_every_tab(chat):
+    alice = login(chat, 'alice')
+    bob = login(chat, 'bob')
+    group_id = chat.db.create_group('g', 'alice', ['bob'])
+    
+    alice_socket = connect(chat, alice)
+    bob_tabs = [connect(chat, bob), connect(chat, bob)]
+    for socket in [alice_socket] + bob_tabs:
+        socket.emit('join_group', {'group_id': group_id})
+        socket.get_received()
+    
+    response = alice.delete(f'/api/groups/{group_id}/members', json={'members': ['bob']})
+    assert response.get_json()['removed'] == ['bob']
+    for tab in bob_tabs:
+        assert 'group_removed' in names(tab)
+    
+    alice_socket.emit('group_message', {'group_id': group_id, 'text': 'hi'})
+    alice_socket.get_received()
+    for tab in bob_tabs:
+        assert 'new_group_message' not in names(tab)
+    
+    bob_tabs[0].emit('group_message', {'group_id': group_id, 'text': 'still here'})
+    assert 'new_group_message' not in names(alice_socket)
+    assert [m['text'] for m in chat.db.get_group_history(group_id)] == ['hi']
+
+def test_membership_endpoint_without_connected_sockets(chat):
+    alice = login(chat, 'alice')
+    group_id = chat.db.create_group('g', 'alice', [])
+    
+    assert '/' not in chat.socketio.server.manager.rooms
+    response = alice.post(f'/api/groups/{group_id}/members', json={'members': ['bob']})
+    
+    assert response.status_code == 200
+    assert response.get_json()['added'] == ['bob']
+
+def test_rate_limited_event_is_dropped_with_single_notice(chat):
+    alice = login(chat, 'alice')
+    socket = connect(chat, alice)
+    socket.emit('start_private_chat', {'other_user': 'bob'})
+    chat_id = socket.get_received()[0]['args'][0]['chat_id']
+    
+    for i in range(15):
+        socket.emit('private_message', {'chat_id': chat_id, 'text': f'm{i}'})
+    received = names(socket)
+    
+    capacity = chat.app.config['RATE_LIMITS']['private_message']['connection'][1]
+    assert received.count('new_private_message') == capacity
+    assert received.count('rate_limited') == 1
+    assert chat.rate_limiter.stats() == {'connection:private_message': 15 - capacity}
+
+def test_guarded_emit_skips_slow_consumers(chat, monkeypatch):
+    alice = login(chat, 'alice')
+    bob = login(chat, 'bob')
+    group_id = chat.db.create_group('g', 'alice', ['bob'])
+    alice_socket = connect(chat, alice)
+    bob_socket = connect(chat, bob)
+    for socket in (alice_socket, bob_socket):
+        socket.emit('join_group', {'group_id': group_id})
+        socket.get_received()
+    
+    slow_eio_sid = bob_socket.eio_sid
+    monkeypatch.setattr(chat.outbound_guard, 'backlog',
+                        lambda server, eio_sid: 1000 if eio_sid == slow_eio_sid else 0)
+    alice_socket.emit('group_message', {'group_id': group_id, 'text': 'hi'})
+    
+    assert 'new_group_message' in names(alice_socket)
+    assert 'new_group_message' not in names(bob_socket)
+    assert chat.outbound_guard.stats() == {'dropped': 1}
+
+def test_rate_limited_requires_configured_event(chat):
+    with pytest.raises(KeyError):
+        chat.rate_limited('no_such_event')
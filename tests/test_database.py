@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # database.py создает глобальный chat.db при импорте - держим его во временной папке
+    monkeypatch.chdir(tmp_path)
+    from database import Database
+    
+    database = Database(str(tmp_path / 'test.db'))
+    conn = sqlite3.connect(database.db_path)
+    conn.executemany('''
+        INSERT INTO users (username, password_hash, joined_date, last_seen)
+        VALUES (?, 'x', 'd', 'd')
+    ''', [(name,) for name in ['alice', 'bob', 'carl', 'dave']])
+    conn.commit()
+    conn.close()
+    return database
+
+def members(db, group_id):
+    conn = sqlite3.connect(db.db_path)
+    rows = conn.execute('SELECT username FROM group_members WHERE group_id = ?', (group_id,))
+    result = {row[0] for row in rows}
+    conn.close()
+    return result
+
+def test_create_group_skips_duplicates_and_unknown_users(db):
+    group_id = db.create_group('g', 'alice', ['bob', 'bob', 'alice', 'zzz'])
+    
+    assert members(db, group_id) == {'alice', 'bob'}
+    assert db.get_group(group_id)['member_count'] == 2
+
+def test_add_group_members_returns_only_new_known_users(db):
+    group_id = db.create_group('g', 'alice', ['bob'])
+    
+    added = db.add_group_members(group_id, ['bob', 'carl', 'carl', 'zzz', 'dave'])
+    
+    assert added == ['carl', 'dave']
+    assert members(db, group_id) == {'alice', 'bob', 'carl', 'dave'}
+    assert db.add_group_members(group_id, ['bob']) == []
+
+def test_add_group_members_in_batches(db, monkeypatch):
+    monkeypatch.setattr('database.SQL_BATCH_SIZE', 2)
+    group_id = db.create_group('g', 'alice', [])
+    
+    assert db.add_group_members(group_id, ['bob', 'carl', 'dave', 'zzz']) == ['bob', 'carl', 'dave']
+
+def test_remove_group_members_keeps_admin(db):
+    group_id = db.create_group('g', 'alice', ['bob', 'carl'])
+    
+    removed = db.remove_group_members(group_id, ['alice', 'bob', 'dave'])
+    
+    assert removed == ['bob']
+    assert members(db, group_id) == {'alice', 'carl'}
+
+def test_missing_group(db):
+    assert db.add_group_members(999, ['bob']) is None
+    assert db.remove_group_members(999, ['bob']) is None
+    assert db.get_group(999) is None
@@ -0,0 +1,140 @@
+import pytest
+
+from flow_control import TokenBucket, RateLimiter, OutboundGuard
+
+class FakeClock:
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr('flow_control.time.monotonic', lambda: self.now)
+
+@pytest.fixture
+def clock(monkeypatch):
+    return FakeClock(monkeypatch)
+
+def test_token_bucket_rejects_when_empty_and_refills(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    
+    assert bucket.consume(clock.now) == 0
+    assert bucket.consume(clock.now) == 0
+    assert bucket.consume(clock.now) == pytest.approx(0.5)
+    
+    clock.now += 0.5
+    assert bucket.consume(clock.now) == 0
+    
+    # Не копит больше capacity
+    clock.now += 100
+    bucket.refill(clock.now)
+    assert bucket.tokens == 2
+
+def test_rate_limiter_connection_and_user_scopes(clock):
+    limiter = RateLimiter({'msg': {'connection': (1, 2), 'user': (1, 3)}})
+    
+    assert limiter.check('msg', 'sid1', 'alice') == 0
+    assert limiter.check('msg', 'sid1', 'alice') == 0
+    assert limiter.check('msg', 'sid1', 'alice') > 0  # лимит соединения
+    
+    assert limiter.check('msg', 'sid2', 'alice') == 0
+    assert limiter.check('msg', 'sid2', 'alice') > 0  # лимит пользователя
+    assert limiter.check('msg', 'sid3', 'bob') == 0
+    
+    assert limiter.stats() == {'connection:msg': 1, 'user:msg': 1}
+
+def test_rate_limiter_does_not_charge_rejected_events(clock):
+    limiter = RateLimiter({'msg': {'connection': (1, 5), 'user': (1, 1)}})
+    
+    assert limiter.check('msg', 'sid1', 'alice') == 0
+    for _ in range(3):
+        assert limiter.check('msg', 'sid1', 'alice') > 0
+    
+    assert limiter.buckets['connection']['sid1']['msg'].tokens == 4
+
+def test_rate_limiter_ignores_unknown_events_and_missing_scope(clock):
+    limiter = RateLimiter({'msg': {'connection': (1, 1), 'user': (1, 1)}})
+    
+    assert limiter.check('other', 'sid1', 'alice') == 0
+    assert limiter.check('msg', None, 'alice') == 0
+    assert 'sid1' not in limiter.buckets['connection']
+
+def test_forget_connection_resets_connection_buckets_only(clock):
+    limiter = RateLimiter({'msg': {'connection': (1, 1), 'user': (1, 2)}})
+    limiter.check('msg', 'sid1', 'alice')
+    
+    limiter.forget_connection('sid1')
+    
+    assert 'sid1' not in limiter.buckets['connection']
+    assert limiter.check('msg', 'sid1', 'alice') == 0
+    assert limiter.check('msg', 'sid2', 'alice') > 0
+
+def test_should_notify_once_per_window(clock):
+    limiter = RateLimiter({})
+    
+    assert limiter.should_notify('sid1', 'msg', 1.0)
+    assert not limiter.should_notify('sid1', 'msg', 1.0)
+    assert limiter.should_notify('sid1', 'typing', 1.0)
+    
+    clock.now += 1.0
+    assert limiter.should_notify('sid1', 'msg', 1.0)
+
+class FakeQueue:
+    def __init__(self, size):
+        self.size = size
+    
+    def qsize(self):
+        return self.size
+
+class FakeSocket:
+    def __init__(self, size):
+        self.queue = FakeQueue(size)
+
+class FakeEngine:
+    def __init__(self, backlogs):
+        self.sockets = {f'eio-{sid}': FakeSocket(size) for sid, size in backlogs.items()}
+        self.closed = []
+    
+    def disconnect(self, eio_sid):
+        self.sockets.pop(eio_sid)
+        self.closed.append(eio_sid)
+
+class FakeServer:
+    """Минимум python-socketio, который использует OutboundGuard"""
+    
+    def __init__(self, backlogs):
+        self.eio = FakeEngine(backlogs)
+        self.manager = self
+        self.rooms = {'/': {}} if backlogs else {}
+        self.disconnected = []
+    
+    def get_participants(self, namespace, room):
+        for eio_sid in list(self.eio.sockets):
+            yield eio_sid[len('eio-'):], eio_sid
+    
+    def disconnect(self, sid, namespace=None):
+        self.disconnected.append(sid)
+
+def test_outbound_guard_drop_policy():
+    server = FakeServer({'fast': 0, 'slow': 11})
+    guard = OutboundGuard(limit=10, policy='drop')
+    
+    assert guard.slow_consumers(server, '/', None) == ['slow']
+    assert server.disconnected == []
+    assert server.eio.closed == []
+    assert guard.stats() == {'dropped': 1}
+
+def test_outbound_guard_disconnect_policy():
+    server = FakeServer({'fast': 10, 'slow': 50})
+    guard = OutboundGuard(limit=10, policy='disconnect')
+    
+    assert guard.slow_consumers(server, '/', None) == ['slow']
+    assert server.disconnected == ['slow']
+    assert server.eio.closed == ['eio-slow']
+    assert 'eio-slow' not in server.eio.sockets
+    assert guard.stats() == {'dropped': 1, 'disconnected': 1}
+
+def test_outbound_guard_without_connected_clients():
+    guard = OutboundGuard(limit=10, policy='disconnect')
+    
+    assert guard.slow_consumers(FakeServer({}), '/', 'room') == []
+
+def test_outbound_guard_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        OutboundGuard(limit=10, policy='block')